@@ -10,15 +10,18 @@ CORS(app, resources={r"/api/*": {"origins": "https://faham-from-nowhere.github.i
 
 # ... rest of your Flask app code and routes ...
 import chess # Still useful for board representation and move parsing
-import math
-import random
+import chess.polyglot # Standard Zobrist keys
 import time
+import array # Compact fixed-size storage for the transposition table
+import collections # TTEntry records returned by tt_probe
 import asyncio # For running async route (Flask[async])
 import traceback # Import for detailed error logging
-import sys # NEW: Import for setting recursion limit
-
-# Set a higher recursion limit to prevent RecursionError for deep searches
-sys.setrecursionlimit(2000) # Increased from default (often 1000) to 2000
+import threading # Per-thread reusable board for the searches, Lazy SMP stop flag
+import os
+import itertools # Ids for split root searches
+import sys
+import concurrent.futures # Process pool the searches run in, thread pool for Lazy SMP helpers
+import multiprocessing # Start method for the search pool's worker processes
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -124,553 +127,1019 @@ PIECE_TABLES = {
     chess.KING: KING_TABLE
 }
 
+# Flattened piece-square tables, indexed by square (a1 = 0 ... h8 = 63).
+# Row 0 of the tables above is the 8th rank from White's point of view, so
+# White reads them upside down and Black reads them as written.
+PSQT_WHITE = {
+    piece_type: tuple(table[7 - chess.square_rank(square)][chess.square_file(square)] for square in chess.SQUARES)
+    for piece_type, table in PIECE_TABLES.items()
+}
+PSQT_BLACK = {
+    piece_type: tuple(table[chess.square_rank(square)][chess.square_file(square)] for square in chess.SQUARES)
+    for piece_type, table in PIECE_TABLES.items()
+}
+# Indexed by color (chess.BLACK == False == 0, chess.WHITE == True == 1)
+PSQT = (PSQT_BLACK, PSQT_WHITE)
+
+# Material value folded into the piece-square tables, so evaluation needs a
+# single lookup per piece. Indexed like PSQT.
+MATERIAL_PSQT = tuple(
+    {piece_type: tuple(PIECE_VALUES[piece_type] + value for value in table) for piece_type, table in psqt.items()}
+    for psqt in PSQT
+)
+
+# Penalty for a piece attacked by the other side and not defended: 80% of its
+# value, in whole centipawns like every other evaluation term
+HANGING_PIECE_PENALTY = {piece_type: value * 4 // 5 for piece_type, value in PIECE_VALUES.items()}
+
+# The two diagonal shifts that move a color's pawns onto the squares they attack,
+# indexed by color. Each shift maps every pawn to one attacked square, so all pawns
+# of a side are handled with a couple of bitboard operations instead of one call per pawn.
+PAWN_ATTACK_SHIFTS = (
+    (chess.shift_down_left, chess.shift_down_right),
+    (chess.shift_up_left, chess.shift_up_right),
+)
+
+def _passed_pawn_mask(square, pawn_color):
+    """Squares on the pawn's file and adjacent files that lie ahead of it."""
+    file_idx = chess.square_file(square)
+    rank_idx = chess.square_rank(square)
+
+    files = 0
+    for f in range(max(0, file_idx - 1), min(8, file_idx + 2)):
+        files |= chess.BB_FILES[f]
+
+    ahead = 0
+    ranks_ahead = range(rank_idx + 1, 8) if pawn_color == chess.WHITE else range(0, rank_idx)
+    for r in ranks_ahead:
+        ahead |= chess.BB_RANKS[r]
+    return files & ahead
+
+# A pawn is passed if no opposing pawn is on its mask. Indexed by color, then square.
+PASSED_PAWN_MASKS = (
+    tuple(_passed_pawn_mask(square, chess.BLACK) for square in chess.SQUARES),
+    tuple(_passed_pawn_mask(square, chess.WHITE) for square in chess.SQUARES),
+)
+
+# Passed pawn bonus for how far the pawn has advanced, indexed by color, then rank:
+# 0 for a pawn on its starting rank, up to 50 one step from promotion
+PASSED_PAWN_ADVANCEMENT = (
+    tuple((6 - rank) * 10 for rank in range(8)),
+    tuple((rank - 1) * 10 for rank in range(8)),
+)
+
+# Squares around the king (plus its own square), indexed by square
+KING_RING = tuple(chess.BB_KING_ATTACKS[square] | chess.BB_SQUARES[square] for square in chess.SQUARES)
+
+def _king_shield_masks(square, color):
+    """Squares one and two ranks in front of a king on 'square', on its own and adjacent files."""
+    forward = 1 if color == chess.WHITE else -1
+    shield_rank = chess.square_rank(square) + forward
+    if not 0 <= shield_rank <= 7:
+        return 0, 0
+    near = KING_RING[square] & chess.BB_RANKS[shield_rank]
+    far = chess.shift_up(near) if color == chess.WHITE else chess.shift_down(near)
+    return near, far
+
+# (one rank ahead, two ranks ahead) shield masks, indexed by color, then king square
+KING_SHIELD_MASKS = (
+    tuple(_king_shield_masks(square, chess.BLACK) for square in chess.SQUARES),
+    tuple(_king_shield_masks(square, chess.WHITE) for square in chess.SQUARES),
+)
+
+# A knight is on an outpost if no opposing pawn on an adjacent file can ever
+# advance to attack it: the passed-pawn mask without the knight's own file.
+OUTPOST_MASKS = tuple(
+    tuple(PASSED_PAWN_MASKS[color][square] & ~chess.BB_FILES[chess.square_file(square)] for square in chess.SQUARES)
+    for color in (chess.BLACK, chess.WHITE)
+)
+
+CENTER_BB = chess.BB_D4 | chess.BB_E4 | chess.BB_D5 | chess.BB_E5
+# Knight and bishop starting squares, indexed by color
+MINOR_PIECE_START_SQUARES = (chess.BB_B8 | chess.BB_C8 | chess.BB_F8 | chess.BB_G8,
+                             chess.BB_B1 | chess.BB_C1 | chess.BB_F1 | chess.BB_G1)
+
+# SQUARES_BETWEEN[a][b] is the bitboard of squares strictly between a and b
+# (0 if they don't share a rank, file or diagonal), looked up instead of
+# calling chess.between() during evaluation.
+SQUARES_BETWEEN = tuple(tuple(chess.between(a, b) for b in chess.SQUARES) for a in chess.SQUARES)
+
+# --- Zobrist Hashing ---
+# The standard Polyglot random keys, so positions hash exactly as
+# chess.polyglot.zobrist_hash() (and Polyglot opening books) hash them.
+_polyglot_keys = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+# Indexed by 64 * ((piece_type - 1) * 2 + color) + square
+ZOBRIST_PIECES = _polyglot_keys[:768]
+# Indexed by a 4-bit mask of castling rights (white king/queen side, black king/queen side);
+# each entry XORs together the keys of the rights it contains
+ZOBRIST_CASTLING = [0] * 16
+for _index in range(16):
+    for _right in range(4):
+        if _index & (1 << _right):
+            ZOBRIST_CASTLING[_index] ^= _polyglot_keys[768 + _right]
+ZOBRIST_EP_FILE = _polyglot_keys[772:780]
+ZOBRIST_TURN = _polyglot_keys[780] # XORed in when White is to move
+
+def _zobrist_castling_index(castling_rights):
+    """Packs the rook squares of a castling_rights bitboard into a 4-bit index."""
+    return ((castling_rights & chess.BB_H1 != 0)
+            | (castling_rights & chess.BB_A1 != 0) << 1
+            | (castling_rights & chess.BB_H8 != 0) << 2
+            | (castling_rights & chess.BB_A8 != 0) << 3)
+
+class ZobristBoard(chess.Board):
+    """
+    chess.Board that keeps a Zobrist key of the position in self.zkey.
+    The key is updated incrementally in push() and restored in pop(), so
+    looking it up is O(1) instead of rebuilding board.fen() at every node.
+    """
+
+    def clear_stack(self):
+        # Every way of setting up a position (reset, set_fen, clear, ...) ends here
+        super().clear_stack()
+        self.zkey = self._compute_zkey()
+        self._zkey_stack = []
+
+    def _compute_zkey(self):
+        """Hashes the whole position from scratch."""
+        zkey = 0
+        for square, piece in self.piece_map().items():
+            zkey ^= ZOBRIST_PIECES[64 * ((piece.piece_type - 1) * 2 + piece.color) + square]
+        zkey ^= self._state_zkey()
+        if self.turn == chess.WHITE:
+            zkey ^= ZOBRIST_TURN
+        return zkey
+
+    def _touched_squares(self, move):
+        """Squares whose contents can change when 'move' is pushed."""
+        if not move:
+            return () # Null move: only turn and en passant change
+        piece = self.piece_at(move.from_square)
+        if piece is None:
+            return (move.from_square, move.to_square)
+        if piece.piece_type == chess.KING and (
+                abs(chess.square_file(move.from_square) - chess.square_file(move.to_square)) > 1
+                or self.rooks & self.occupied_co[piece.color] & chess.BB_SQUARES[move.to_square]):
+            # Castling also moves a rook, so rehash the whole back rank
+            return chess.SquareSet(chess.BB_RANK_1 if piece.color == chess.WHITE else chess.BB_RANK_8)
+        if piece.piece_type == chess.PAWN and move.to_square == self.ep_square:
+            # En passant removes the pawn behind the target square
+            captured_square = move.to_square - 8 if piece.color == chess.WHITE else move.to_square + 8
+            return (move.from_square, move.to_square, captured_square)
+        return (move.from_square, move.to_square)
+
+    def _squares_zkey(self, squares):
+        zkey = 0
+        for square in squares:
+            piece = self.piece_at(square)
+            if piece:
+                zkey ^= ZOBRIST_PIECES[64 * ((piece.piece_type - 1) * 2 + piece.color) + square]
+        return zkey
+
+    def _state_zkey(self):
+        """Part of the key that depends on castling rights and the en passant square."""
+        zkey = ZOBRIST_CASTLING[_zobrist_castling_index(self.castling_rights)]
+        # Like Polyglot, the en passant file only counts if a pawn is there to capture
+        ep_square = self.ep_square
+        if ep_square is not None and \
+           chess.BB_PAWN_ATTACKS[not self.turn][ep_square] & self.pawns & self.occupied_co[self.turn]:
+            zkey ^= ZOBRIST_EP_FILE[chess.square_file(ep_square)]
+        return zkey
+
+    def push(self, move):
+        self._zkey_stack.append(self.zkey)
+        squares = self._touched_squares(move)
+        zkey = self.zkey ^ self._squares_zkey(squares) ^ self._state_zkey()
+        super().push(move)
+        self.zkey = zkey ^ self._squares_zkey(squares) ^ self._state_zkey() ^ ZOBRIST_TURN
+
+    def pop(self):
+        move = super().pop()
+        self.zkey = self._zkey_stack.pop()
+        return move
+
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board.zkey = self.zkey
+        if stack:
+            stack = len(self._zkey_stack) if stack is True else stack
+            board._zkey_stack = self._zkey_stack[-stack:]
+        return board
+
 # Transposition Table
-transposition_table = {}
+# Fixed-size table so memory stays bounded on a long-running server. Slots are
+# grouped in buckets of two: the first slot is depth-preferred, the second is
+# always-replace. Keys and packed entries live in two parallel arrays.
+# A key slot holds key ^ entry, so an entry torn by a Lazy SMP thread storing
+# between the two writes fails the key check instead of being read back.
+# The table is kept between requests; each entry records the search generation
+# that wrote it, so entries left over from earlier moves are replaced first.
+# Every process that searches (each search pool worker) has its own table of
+# TT_MEGABYTES (at least 1); a slot takes 16 bytes, and the slot count is rounded down to a power of two.
+TT_MEGABYTES = max(1, int(os.environ.get('TT_MEGABYTES', 16)))
+TT_SIZE = 1 << ((TT_MEGABYTES * 1024 * 1024 // 16).bit_length() - 1) # Number of slots
+TT_BUCKET_MASK = (TT_SIZE >> 1) - 1
+tt_keys = array.array('Q', bytes(8 * TT_SIZE))
+tt_entries = array.array('q', bytes(8 * TT_SIZE)) # score << 34 | best move << 18 | generation << 10 | flag << 8 | depth
+tt_generation = 0 # Incremented for every new search, wraps at 8 bits
+TT_KEY_MASK = (1 << 64) - 1 # Packed entries are signed; keys are 64-bit unsigned
 TT_EXACT = 0
 TT_LOWERBOUND = 1
 TT_UPPERBOUND = 2
 
-# --- AI Helper Functions ---
-
-def get_piece_table(piece_type, color, board_state):
-    """Returns the correct piece-square table, flipped for black if needed."""
-    table = PIECE_TABLES.get(piece_type)
-    if not table:
-        return None
+TTEntry = collections.namedtuple('TTEntry', 'depth score flag best_move')
 
-    # Flip table for black pieces
-    if color == chess.BLACK:
-        # Create a new list of lists, where each inner list is reversed
-        flipped_table = [row[::-1] for row in reversed(table)]
-        return flipped_table
-    return table
+def encode_move(move):
+    """Packs a move into 15 bits: from square, to square and promotion piece type."""
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
 
-def _is_path_clear(board, square1, square2):
-    """
-    Checks if there are any pieces between square1 and square2.
-    Assumes square1 and square2 are on the same rank or file.
-    This replaces chess.squares_between due to reported issues.
-    """
-    file1, rank1 = chess.square_file(square1), chess.square_rank(square1)
-    file2, rank2 = chess.square_file(square2), chess.square_rank(square2)
-
-    if rank1 == rank2:  # Same rank
-        start_file = min(file1, file2) + 1
-        end_file = max(file1, file2)
-        for f in range(start_file, end_file):
-            if board.piece_at(chess.square(f, rank1)):
-                return False
-    elif file1 == file2:  # Same file
-        start_rank = min(rank1, rank2) + 1
-        end_rank = max(rank1, rank2)
-        for r in range(start_rank, end_rank):
-            if board.piece_at(chess.square(file1, r)):
-                return False
-    # For diagonals, if needed, this function would need more logic.
-    # For rook connection, we only care about ranks/files.
-    return True
-
-# Helper function to check if a rank or file coordinate is valid (0-7)
-def _is_valid_coord(coord):
-    return 0 <= coord <= 7
-
-def _is_passed_pawn(board, square, pawn_color):
+def decode_move(code):
+    """Inverse of encode_move; 0 means no move was stored."""
+    if not code:
+        return None
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, (code >> 12) or None)
+
+def tt_probe(key):
+    """Returns the TTEntry stored for the Zobrist key, or None on a miss."""
+    slot = (key & TT_BUCKET_MASK) << 1
+    entry = tt_entries[slot]
+    if (tt_keys[slot] ^ entry) & TT_KEY_MASK != key:
+        entry = tt_entries[slot + 1]
+        if (tt_keys[slot + 1] ^ entry) & TT_KEY_MASK != key:
+            return None
+    return TTEntry(entry & 0xFF, entry >> 34, (entry >> 8) & 0x3, decode_move((entry >> 18) & 0xFFFF))
+
+def tt_store(key, depth, score, flag, best_move=None):
     """
-    Checks if a pawn at 'square' is a passed pawn for 'pawn_color'.
-    A pawn is passed if there are no opposing pawns in its file or adjacent files
-    on its way to promotion.
+    Stores an entry. The depth-preferred slot is replaced if it holds the same
+    position, if the new search was at least as deep, or if its entry is from an
+    earlier search; otherwise the always-replace slot is used. A quiescence score
+    (depth 0) doesn't replace a deeper entry for the same position from this search,
+    and an entry stored without a best move keeps the one already known for the position.
     """
-    file_idx = chess.square_file(square)
-    rank_idx = chess.square_rank(square)
-    
-    opponent_color = chess.BLACK if pawn_color == chess.WHITE else chess.WHITE
-
-    # Determine the direction of pawn advancement
-    if pawn_color == chess.WHITE:
-        # For white, ranks increase (from 0 to 7) as pawn advances
-        # We need to check ranks higher than the current pawn's rank
-        start_rank_check = rank_idx + 1
-        end_rank_check = 8 # Up to rank 7 (index 7)
-        direction_step = 1
-    else: # black pawn
-        # For black, ranks decrease (from 7 to 0) as pawn advances
-        # We need to check ranks lower than the current pawn's rank
-        start_rank_check = rank_idx - 1
-        end_rank_check = -1 # Down to rank 0 (index 0)
-        direction_step = -1
-
-    # Check current file and adjacent files
-    for f in range(max(0, file_idx - 1), min(8, file_idx + 2)):
-        # Iterate through ranks in the pawn's advancement direction
-        r = start_rank_check
-        while (pawn_color == chess.WHITE and r < end_rank_check) or \
-              (pawn_color == chess.BLACK and r > end_rank_check):
-            
-            target_square = chess.square(f, r)
-            piece = board.piece_at(target_square)
+    slot = (key & TT_BUCKET_MASK) << 1
+    stored = tt_entries[slot]
+    if (tt_keys[slot] ^ stored) & TT_KEY_MASK != key:
+        if depth < (stored & 0xFF) and (stored >> 10) & 0xFF == tt_generation:
+            slot += 1 # Keep the deeper entry, use the always-replace slot
+            stored = tt_entries[slot]
+        if (tt_keys[slot] ^ stored) & TT_KEY_MASK != key:
+            stored = 0 # Another position's entry; none of it is kept
+    elif not depth and stored & 0xFF and (stored >> 10) & 0xFF == tt_generation:
+        return
+    move_code = encode_move(best_move) if best_move else (stored >> 18) & 0xFFFF
+    entry = score << 34 | move_code << 18 | tt_generation << 10 | flag << 8 | depth
+    tt_entries[slot] = entry
+    tt_keys[slot] = (key ^ entry) & TT_KEY_MASK
+
+def tt_bound(score, alpha, beta):
+    """Flag for a score searched with the window (alpha, beta): fail-low and fail-high scores are only bounds."""
+    if score <= alpha:
+        return TT_UPPERBOUND
+    if score >= beta:
+        return TT_LOWERBOUND
+    return TT_EXACT
+
+def tt_new_search():
+    """Starts a new search generation, so entries from earlier searches age out."""
+    global tt_generation
+    tt_generation = (tt_generation + 1) & 0xFF
 
-            if piece and piece.piece_type == chess.PAWN and piece.color == opponent_color:
-                return False # Opposing pawn found, not a passed pawn
-            r += direction_step
-    return True # No opposing pawns found in the way
+# --- AI Helper Functions ---
 
 def evaluate_board(board, ai_color_is_white):
     """Evaluates the given board state from the AI's perspective."""
     score = 0
-    ai_color = chess.WHITE if ai_color_is_white else chess.BLACK
-    opponent_color = chess.BLACK if ai_color_is_white else chess.WHITE
-
-    white_bishops = 0
-    black_bishops = 0
-
-    # Piece values (material) and Piece-Square Tables (positional)
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece:
-            piece_type = piece.piece_type
-            piece_color = piece.color
-            value = PIECE_VALUES.get(piece_type, 0)
-
-            # Get row and column for piece-square tables
-            row, col = chess.square_rank(square), chess.square_file(square)
-
-            table = get_piece_table(piece_type, piece_color, board)
-            positional_value = table[row][col] if table else 0
-
-            if piece_color == ai_color:
-                score += value + positional_value
-            else:
-                score -= (value + positional_value)
-
-            # Count bishops for bishop pair bonus
-            if piece_type == chess.BISHOP:
-                if piece_color == chess.WHITE:
-                    white_bishops += 1
-                else:
-                    black_bishops += 1
-
-            # Mobility bonus (number of pseudo-legal moves)
-            temp_board_for_mobility = board.copy()
-            temp_board_for_mobility.turn = piece_color # Set turn for pseudo-legal moves calculation
-            mobility_bonus = len(list(temp_board_for_mobility.legal_moves)) * 2
-
-            if piece_color == ai_color:
-                score += mobility_bonus
-            else:
-                score -= mobility_bonus
-
-            # Piece Safety / Hanging Pieces (simplified check)
-            if board.is_attacked_by(opponent_color, square) and not board.is_attacked_by(piece_color, square):
-                if piece_color == ai_color:
-                    score -= value * 0.8
-                else:
-                    score += value * 0.8
-
-    # Bishop Pair Bonus
-    if white_bishops >= 2:
-        score += 30 if ai_color_is_white else -30
-    if black_bishops >= 2:
-        score += 30 if not ai_color_is_white else -30
-
-    # Rook Connection/Battery
-    rook_connection_bonus = 10
-    white_rooks = []
-    black_rooks = []
-
-    for square in chess.SQUARES:
-        piece = board.piece_at(square)
-        if piece and piece.piece_type == chess.ROOK:
-            if piece.color == chess.WHITE:
-                white_rooks.append(square)
-            else:
-                black_rooks.append(square)
-    
-    # Check for rook connection using the custom _is_path_clear function
-    if len(white_rooks) >= 2:
-        for i in range(len(white_rooks)):
-            for j in range(i + 1, len(white_rooks)):
-                sq1, sq2 = white_rooks[i], white_rooks[j]
-                if chess.square_rank(sq1) == chess.square_rank(sq2): # Same rank
-                    if _is_path_clear(board, sq1, sq2):
-                        score += (rook_connection_bonus if ai_color_is_white else -rook_connection_bonus)
-                elif chess.square_file(sq1) == chess.square_file(sq2): # Same file
-                    if _is_path_clear(board, sq1, sq2):
-                        score += (rook_connection_bonus if not ai_color_is_white else -rook_connection_bonus)
-
-    if len(black_rooks) >= 2:
-        for i in range(len(black_rooks)):
-            for j in range(i + 1, len(black_rooks)):
-                sq1, sq2 = black_rooks[i], black_rooks[j]
-                if chess.square_rank(sq1) == chess.square_rank(sq2): # Same rank
-                    if _is_path_clear(board, sq1, sq2):
-                        score += (rook_connection_bonus if not ai_color_is_white else -rook_connection_bonus)
-                elif chess.square_file(sq1) == chess.square_file(sq2): # Same file
-                    if _is_path_clear(board, sq1, sq2):
-                        score += (rook_connection_bonus if not ai_color_is_white else -rook_connection_bonus)
-
-
-    # Pawn Structure (doubled, isolated, connected, passed)
-    for file_index in range(8):
-        pawns_in_file_white = sum(1 for rank in range(8) if board.piece_at(chess.square(file_index, rank)) == chess.Piece(chess.PAWN, chess.WHITE))
-        pawns_in_file_black = sum(1 for rank in range(8) if board.piece_at(chess.square(file_index, rank)) == chess.Piece(chess.PAWN, chess.BLACK))
-
-        # Doubled pawns
-        if pawns_in_file_white > 1:
-            score += -20 if ai_color_is_white else 20
-        if pawns_in_file_black > 1:
-            score += -20 if not ai_color_is_white else 20
-
-        # Isolated pawns
-        is_isolated_white = pawns_in_file_white > 0 and \
-                            (file_index == 0 or sum(1 for rank in range(8) if board.piece_at(chess.square(file_index - 1, rank)) == chess.Piece(chess.PAWN, chess.WHITE)) == 0) and \
-                            (file_index == 7 or sum(1 for rank in range(8) if board.piece_at(chess.square(file_index + 1, rank)) == chess.Piece(chess.PAWN, chess.WHITE)) == 0)
-        if is_isolated_white:
-            score += -15 if ai_color_is_white else 15
-
-        is_isolated_black = pawns_in_file_black > 0 and \
-                            (file_index == 0 or sum(1 for rank in range(8) if board.piece_at(chess.square(file_index - 1, rank)) == chess.Piece(chess.PAWN, chess.BLACK)) == 0) and \
-                            (file_index == 7 or sum(1 for rank in range(8) if board.piece_at(chess.square(file_index + 1, rank)) == chess.Piece(chess.PAWN, chess.BLACK)) == 0)
-        if is_isolated_black:
-            score += -15 if not ai_color_is_white else 15
-        
-        # Connected Pawns (simplified - just checks for adjacent pawns)
-        for rank_index in range(8):
-            pawn = board.piece_at(chess.square(file_index, rank_index))
-            if pawn and pawn.piece_type == chess.PAWN:
-                if file_index > 0 and board.piece_at(chess.square(file_index - 1, rank_index)) == chess.Piece(chess.PAWN, pawn.color):
-                    score += 5 if (pawn.color == ai_color) else -5
-                if file_index < 7 and board.piece_at(chess.square(file_index + 1, rank_index)) == chess.Piece(chess.PAWN, pawn.color):
-                    score += 5 if (pawn.color == ai_color) else -5
-
-
-    # King Safety (Pawn Shield) - Enhanced
-    king_safety_bonus = 10
-    king_attack_penalty = 50
-    king_open_file_penalty = 10
-
-    king_square_white = board.king(chess.WHITE)
-    king_square_black = board.king(chess.BLACK)
-
-    if king_square_white:
-        white_king_safety = 0
-        white_king_rank, white_king_file = chess.square_rank(king_square_white), chess.square_file(king_square_white)
-        # Check pawns in front of white king (ranks 1 and 2 from white's perspective)
-        for f in range(max(0, white_king_file - 1), min(8, white_king_file + 2)):
-            # Check rank - 1
-            target_rank_1 = white_king_rank - 1
-            if _is_valid_coord(target_rank_1) and board.piece_at(chess.square(f, target_rank_1)) == chess.Piece(chess.PAWN, chess.WHITE):
-                white_king_safety += 10
-            # Check rank - 2
-            target_rank_2 = white_king_rank - 2
-            if _is_valid_coord(target_rank_2) and board.piece_at(chess.square(f, target_rank_2)) == chess.Piece(chess.PAWN, chess.WHITE):
-                white_king_safety += 5
-        
-        # Check if king is on an open file
-        if not any(board.piece_at(chess.square(white_king_file, r)) == chess.Piece(chess.PAWN, chess.WHITE) for r in range(8)):
-            score -= king_open_file_penalty # Penalty for open file in front of king
-
-        if board.is_check():
-            if ai_color_is_white:
-                score -= king_attack_penalty # Penalty if AI's king is in check
-            else:
-                score += king_attack_penalty # Bonus if opponent's king is in check
-
-        score += white_king_safety if ai_color_is_white else -white_king_safety
-
-    if king_square_black:
-        black_king_safety = 0
-        black_king_rank, black_king_file = chess.square_rank(king_square_black), chess.square_file(king_square_black)
-        # Check pawns in front of black king (ranks 6 and 5 from black's perspective)
-        for f in range(max(0, black_king_file - 1), min(8, black_king_file + 2)):
-            # Check rank + 1
-            target_rank_1 = black_king_rank + 1
-            if _is_valid_coord(target_rank_1) and board.piece_at(chess.square(f, target_rank_1)) == chess.Piece(chess.PAWN, chess.BLACK):
-                black_king_safety += 10
-            # Check rank + 2
-            target_rank_2 = black_king_rank + 2
-            if _is_valid_coord(target_rank_2) and board.piece_at(chess.square(f, target_rank_2)) == chess.Piece(chess.PAWN, chess.BLACK):
-                black_king_safety += 5
-        
-        # Check if king is on an open file
-        if not any(board.piece_at(chess.square(black_king_file, r)) == chess.Piece(chess.PAWN, chess.BLACK) for r in range(8)):
-            score -= king_open_file_penalty # Penalty for open file in front of king
-
-        if board.is_check():
-            if not ai_color_is_white:
-                score -= king_attack_penalty # Penalty if AI's king is in check
-            else:
-                score += king_attack_penalty # Bonus if opponent's king is in check
-        
-        score += black_king_safety if not ai_color_is_white else -black_king_safety
-
-    # Center Control
-    central_squares = [
-        chess.D4, chess.E4,
-        chess.D5, chess.E5
-    ]
-    center_control_bonus = 10
-    for square in central_squares:
-        piece = board.piece_at(square)
-        if piece:
-            if piece.color == ai_color:
-                score += center_control_bonus
-            else:
-                score -= center_control_bonus
-
-    # Development (Early Game) - Simplified
-    # Only for first 10 half-moves (5 full moves)
-    if board.fullmove_number < 6:
-        white_developed_pieces = 0
-        black_developed_pieces = 0
-
-        # Check white knights and bishops not on starting rank
-        for square in [chess.B1, chess.C1, chess.F1, chess.G1]: # B1, C1, F1, G1 are typical starting squares
-            piece = board.piece_at(square)
-            if piece and piece.color == chess.WHITE and piece.piece_type in [chess.KNIGHT, chess.BISHOP]:
-                pass # Still on starting square
-            elif piece is None:
-                pass # Empty square
-            else: # Piece is white, not on starting square, and is a knight/bishop
-                if piece.color == chess.WHITE and piece.piece_type in [chess.KNIGHT, chess.BISHOP]:
-                    white_developed_pieces += 1
-
-        # Check black knights and bishops not on starting rank
-        for square in [chess.B8, chess.C8, chess.F8, chess.G8]: # B8, C8, F8, G8 are typical starting squares
-            piece = board.piece_at(square)
-            if piece and piece.color == chess.BLACK and piece.piece_type in [chess.KNIGHT, chess.BISHOP]:
-                pass # Still on starting square
-            elif piece is None:
-                pass # Empty square
-            else: # Piece is black, not on starting square, and is a knight/bishop
-                if piece.color == chess.BLACK and piece.piece_type in [chess.KNIGHT, chess.BISHOP]:
-                    black_developed_pieces += 1
-
-        if ai_color_is_white:
-            score += (white_developed_pieces * 10) - (black_developed_pieces * 10)
-        else:
-            score += (black_developed_pieces * 10) - (white_developed_pieces * 10)
+    # +1 for the AI's side and -1 for the opponent, indexed by color, so each
+    # term is added as 'signs[color] * term' instead of branching on the color
+    ai_sign = 1 if ai_color_is_white else -1
+    signs = (-ai_sign, ai_sign)
 
+    # Bitboards shared by every term below, read from the board once
+    occupied = board.occupied
+    pawns_by_color = (board.pawns & board.occupied_co[chess.BLACK], board.pawns & board.occupied_co[chess.WHITE])
+    in_check = board.is_check()
+    early_game = board.fullmove_number < 6 # Development only counts for the first 5 full moves
 
-    # Rook on Open/Semi-Open Files
+    rook_connection_bonus = 10
     rook_open_semi_file_bonus = 15
-    for file_idx in range(8):
-        file_is_open_white = True
-        file_is_open_black = True
-        has_white_rook = False
-        has_black_rook = False
-
-        for rank_idx in range(8): # Corrected range(8)
-            square = chess.square(file_idx, rank_idx)
-            piece = board.piece_at(square)
-            if piece:
-                if piece.piece_type == chess.PAWN:
-                    if piece.color == chess.WHITE: file_is_open_white = False
-                    else: file_is_open_black = False
-                elif piece.piece_type == chess.ROOK:
-                    if piece.color == chess.WHITE: has_white_rook = True
-                    else: has_black_rook = True
-        
-        if has_white_rook and file_is_open_white and file_is_open_black: # Truly open file
-            score += (rook_open_semi_file_bonus if ai_color_is_white else -rook_open_semi_file_bonus)
-        elif has_white_rook and file_is_open_black: # Semi-open (no black pawns)
-            score += (rook_open_semi_file_bonus / 2 if ai_color_is_white else -rook_open_semi_file_bonus / 2)
-
-        if has_black_rook and file_is_open_black and file_is_open_white: # Truly open file
-            score += (rook_open_semi_file_bonus if not ai_color_is_white else -rook_open_semi_file_bonus)
-        elif has_black_rook and file_is_open_white: # Semi-open (no white pawns)
-            score += (rook_open_semi_file_bonus / 2 if not ai_color_is_white else -rook_open_semi_file_bonus / 2)
-
-    # Passed Pawns
+    rook_semi_open_file_bonus = rook_open_semi_file_bonus // 2
     passed_pawn_base_bonus = 50
-    for sq in chess.SQUARES:
-        piece = board.piece_at(sq)
-        if piece and piece.piece_type == chess.PAWN:
-            # Replaced board.is_passed_pawn with custom _is_passed_pawn
-            if _is_passed_pawn(board, sq, piece.color):
-                rank = chess.square_rank(sq)
-                advancement_bonus = 0
-                if piece.color == chess.WHITE:
-                    advancement_bonus = (rank - 1) * 10 # 2nd rank pawn has 0 bonus, 7th rank has 50
-                else:
-                    advancement_bonus = (6 - rank) * 10 # 7th rank pawn has 0 bonus, 2nd rank has 50
-                
-                if piece.color == ai_color:
-                    score += passed_pawn_base_bonus + advancement_bonus
-                else:
-                    score -= (passed_pawn_base_bonus + advancement_bonus)
-    
-    # Knight Outposts
     knight_outpost_bonus = 25
-    central_squares = [chess.D4, chess.E4, chess.D5, chess.E5]
-    for sq in chess.SQUARES:
-        piece = board.piece_at(sq)
-        if piece and piece.piece_type == chess.KNIGHT:
-            knight_color = piece.color
-            
-            # Check if it's a central square
-            if sq in central_squares:
-                # Check if defended by a friendly pawn
-                is_defended_by_pawn = False
-                for pawn_sq in board.attackers(knight_color, sq):
-                    p = board.piece_at(pawn_sq)
-                    if p and p.piece_type == chess.PAWN and p.color == knight_color:
-                        is_defended_by_pawn = True
-                        break
-                
-                # Check if attacked by an opponent's pawn
-                is_attacked_by_opp_pawn = False
-                opp_color = chess.BLACK if knight_color == chess.WHITE else chess.WHITE
-                for pawn_sq in board.attackers(opp_color, sq):
-                    p = board.piece_at(pawn_sq)
-                    if p and p.piece_type == chess.PAWN and p.color == opp_color:
-                        is_attacked_by_opp_pawn = True
-                        break
-
-                if is_defended_by_pawn and not is_attacked_by_opp_pawn:
-                    if knight_color == ai_color:
-                        score += knight_outpost_bonus
-                    else:
-                        score -= knight_outpost_bonus
+    king_attack_penalty = 50
+    king_open_file_penalty = 10
+    center_control_bonus = 10
 
+    # Piece values (material), Piece-Square Tables (positional) and mobility.
+    # Walk each piece bitboard so only occupied squares are visited, and collect
+    # every square each side attacks for the hanging-piece check below.
+    attacked_by = [0, 0] # Indexed by color
+    # Bind the per-piece calls to locals; this loop runs for every piece of every evaluated position
+    scan_forward = chess.scan_forward
+    popcount = chess.popcount
+    pieces_mask = board.pieces_mask
+    attacks_mask = board.attacks_mask
+    for color in (chess.WHITE, chess.BLACK):
+        not_own = ~board.occupied_co[color]
+        tables = MATERIAL_PSQT[color]
+        side_score = 0
+
+        # Pawns: table lookups per pawn, but attacks and mobility for all of them at once
+        pawns = pawns_by_color[color]
+        pawn_table = tables[chess.PAWN]
+        for square in scan_forward(pawns):
+            side_score += pawn_table[square]
+        shift_left, shift_right = PAWN_ATTACK_SHIFTS[color]
+        attacks_left = shift_left(pawns)
+        attacks_right = shift_right(pawns)
+        attacked = attacks_left | attacks_right
+        side_score += (popcount(attacks_left & not_own) + popcount(attacks_right & not_own)) * 2
+
+        for piece_type in (chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING):
+            table = tables[piece_type]
+            for square in scan_forward(pieces_mask(piece_type, color)):
+                side_score += table[square]
+
+                # Mobility bonus (squares this piece attacks that aren't occupied by its own side)
+                attacks = attacks_mask(square)
+                attacked |= attacks
+                side_score += popcount(attacks & not_own) * 2
+        attacked_by[color] = attacked
+        score += signs[color] * side_score
+
+    for color in (chess.WHITE, chess.BLACK):
+        sign = signs[color]
+        own = board.occupied_co[color]
+        pawns = pawns_by_color[color]
+        opponent_pawns = pawns_by_color[not color]
+        knights = board.knights & own
+        bishops = board.bishops & own
+        rooks = board.rooks & own
+
+        # Piece Safety / Hanging Pieces (attacked by the other side and not defended)
+        for square in chess.scan_forward(own & attacked_by[not color] & ~attacked_by[color]):
+            score -= sign * HANGING_PIECE_PENALTY[board.piece_type_at(square)]
+
+        # Bishop Pair Bonus
+        if chess.popcount(bishops) >= 2:
+            score += sign * 30
+
+        # Rook Connection/Battery (two rooks on the same rank or file with nothing between them)
+        rook_squares = list(chess.scan_forward(rooks))
+        for i in range(len(rook_squares)):
+            for j in range(i + 1, len(rook_squares)):
+                sq1, sq2 = rook_squares[i], rook_squares[j]
+                if chess.square_rank(sq1) == chess.square_rank(sq2) or chess.square_file(sq1) == chess.square_file(sq2):
+                    if not SQUARES_BETWEEN[sq1][sq2] & occupied:
+                        score += sign * rook_connection_bonus
+
+        # Pawn Structure (doubled, isolated), from per-file pawn counts,
+        # and Rook on Open/Semi-Open Files
+        pawns_in_file = [chess.popcount(pawns & file_mask) for file_mask in chess.BB_FILES]
+        for file_index in range(8):
+            file_mask = chess.BB_FILES[file_index]
+
+            # Doubled pawns
+            if pawns_in_file[file_index] > 1:
+                score -= sign * 20
+
+            # Isolated pawns
+            if pawns_in_file[file_index] > 0 and \
+               (file_index == 0 or pawns_in_file[file_index - 1] == 0) and \
+               (file_index == 7 or pawns_in_file[file_index + 1] == 0):
+                score -= sign * 15
+
+            if rooks & file_mask and not opponent_pawns & file_mask:
+                if not pawns_in_file[file_index]: # Truly open file
+                    score += sign * rook_open_semi_file_bonus
+                else: # Semi-open (no opposing pawns)
+                    score += sign * rook_semi_open_file_bonus
+
+        # Connected Pawns (simplified - each pawn scores once per friendly pawn beside it on the same rank)
+        connected = chess.popcount(pawns & (pawns << 1) & ~chess.BB_FILE_A) + \
+                    chess.popcount(pawns & (pawns >> 1) & ~chess.BB_FILE_H)
+        score += sign * 5 * connected
+
+        # Passed Pawns
+        passed_masks = PASSED_PAWN_MASKS[color]
+        advancement = PASSED_PAWN_ADVANCEMENT[color]
+        for sq in chess.scan_forward(pawns):
+            if not passed_masks[sq] & opponent_pawns:
+                score += sign * (passed_pawn_base_bonus + advancement[chess.square_rank(sq)])
+
+        # Knight Outposts (central knight defended by a friendly pawn and out of reach of opposing pawns)
+        outpost_masks = OUTPOST_MASKS[color]
+        for sq in chess.scan_forward(knights & CENTER_BB):
+            if chess.BB_PAWN_ATTACKS[not color][sq] & pawns and not outpost_masks[sq] & opponent_pawns:
+                score += sign * knight_outpost_bonus
+
+        # King Safety (Pawn Shield)
+        king_square = board.king(color)
+        if king_square is not None:
+            # Pawns one and two ranks in front of the king
+            shield_near, shield_far = KING_SHIELD_MASKS[color][king_square]
+            king_safety = 10 * chess.popcount(pawns & shield_near) + 5 * chess.popcount(pawns & shield_far)
+
+            # Check if king is on an open file
+            if not pawns & chess.BB_FILES[chess.square_file(king_square)]:
+                score -= sign * king_open_file_penalty # Penalty for open file in front of king
+
+            if in_check and color == board.turn:
+                score -= sign * king_attack_penalty # Penalty if this side's king is in check
+
+            score += sign * king_safety
+
+        # Center Control
+        score += sign * center_control_bonus * chess.popcount(own & CENTER_BB)
+
+        # Development (Early Game) - knights and bishops that have left their starting squares
+        if early_game:
+            developed_pieces = chess.popcount((knights | bishops) & ~MINOR_PIECE_START_SQUARES[color])
+            score += sign * developed_pieces * 10
 
     return score
 
-# Transposition Table
-transposition_table = {}
-TT_EXACT = 0
-TT_LOWERBOUND = 1
-TT_UPPERBOUND = 2
-
 # Quiescence Search
-def quiescence_search(board, ai_color_is_white, alpha, beta):
+# Maximum plies of captures searched past the nominal depth. Together with
+# the difficulty depth this bounds the recursion, so the default limit is plenty.
+QUIESCENCE_MAX_DEPTH = 8
+# Delta pruning: skip a capture if winning the victim plus this margin still can't reach alpha
+DELTA_MARGIN = 200
+
+def quiescence_search(board, alpha, beta, qs_depth=0):
     # nodes_evaluated += 1 # Global counter in real engine
+
+    # In check, standing pat isn't an option: the check has to be answered
+    if qs_depth < QUIESCENCE_MAX_DEPTH and board.is_check():
+        return quiescence_evasions(board, alpha, beta, qs_depth)
     
-    # Stand-pat evaluation
-    stand_pat = evaluate_board(board, ai_color_is_white)
+    # Stand-pat evaluation, from the side to move's perspective
+    stand_pat = evaluate_board(board, board.turn == chess.WHITE)
 
+    # Fail-soft: return the best score found, even when it lies outside (alpha, beta)
     if stand_pat >= beta:
-        return beta
+        return stand_pat
+    best_score = stand_pat
     if stand_pat > alpha:
         alpha = stand_pat
+    if qs_depth >= QUIESCENCE_MAX_DEPTH:
+        return best_score
 
-    # Generate only "noisy" moves (captures, checks, promotions)
-    # python-chess has a `board.is_capture(move)` and `board.gives_check(move)`
-    # Promotions are implied by the move itself (e.g., e7e8q)
-    noisy_moves = []
-    for move in board.legal_moves:
-        if board.is_capture(move) or board.gives_check(move) or move.promotion:
-            noisy_moves.append(move)
+    # Generate only "noisy" moves: captures, then pawn pushes onto an empty back rank
+    # (promotions). Checks are left to the main search: board.gives_check() has to
+    # play the move to find out.
+    # Pseudo-legal: moves that leave the king in check are skipped after being pushed.
+    noisy_moves = list(board.generate_pseudo_legal_captures())
+    noisy_moves.extend(board.generate_pseudo_legal_moves(board.pawns, chess.BB_BACKRANKS & ~board.occupied))
 
     # Sort noisy moves by MVL/LVA for better pruning
-    noisy_moves.sort(key=lambda move: calculate_mvl_lva(board, move), reverse=True) # Higher is better for MVL/LVA
+    noisy_moves = order_moves(board, noisy_moves)
 
+    # Bind the per-move calls to locals for the loop
+    push = board.push
+    pop = board.pop
+    was_into_check = board.was_into_check
     for move in noisy_moves:
-        board.push(move)
-        score = -quiescence_search(board, not ai_color_is_white, -beta, -alpha) # Negamax
-        board.pop()
-
-        if score >= beta:
-            return beta
-        if score > alpha:
-            alpha = score
+        if not move.promotion:
+            # Delta pruning: even winning the captured piece for free can't raise alpha.
+            # The capture could still have scored up to that much, so the returned bound says so.
+            optimistic_score = stand_pat + VICTIM_VALUES[board.piece_type_at(move.to_square) or 0] + DELTA_MARGIN
+            if optimistic_score < alpha:
+                if optimistic_score > best_score:
+                    best_score = optimistic_score
+                continue
+            # Skip captures that lose material once all the recaptures are played out
+            if static_exchange_eval(board, move) < 0:
+                continue
+
+        push(move)
+        if was_into_check():
+            pop()
+            continue
+        score = -quiescence_search(board, -beta, -alpha, qs_depth + 1) # Negamax
+        pop()
+
+        if score > best_score:
+            best_score = score
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
             
-    return alpha
-
-# Minimax with Alpha-Beta Pruning
-def minimax(board, depth, ai_color_is_white, alpha, beta):
-    # Check transposition table
-    fen = board.fen()
-    if fen in transposition_table:
-        stored_depth, stored_score, flag = transposition_table[fen]
-        if stored_depth >= depth:
-            if flag == TT_EXACT:
-                return stored_score
-            if flag == TT_LOWERBOUND and stored_score >= beta:
-                return stored_score
-            if flag == TT_UPPERBOUND and stored_score <= alpha:
-                return stored_score
+    return best_score
+
+def quiescence_evasions(board, alpha, beta, qs_depth):
+    """Quiescence node for a side in check: every move is searched, and having none is checkmate."""
+    best_score = -MATE_SCORE # Stays at checkmate if no move is legal
+    # Bind the per-move calls to locals; most moves out of check turn out illegal
+    push = board.push
+    pop = board.pop
+    was_into_check = board.was_into_check
+    for move in staged_moves(board):
+        push(move)
+        if was_into_check():
+            pop()
+            continue
+        score = -quiescence_search(board, -beta, -alpha, qs_depth + 1)
+        pop()
+
+        if score > best_score:
+            best_score = score
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+    return best_score
+
+# Score for the side to move being checkmated is -MATE_SCORE
+MATE_SCORE = 1_000_000
+
+# Integer search bounds, larger than any score (including +/- MATE_SCORE).
+# Keeps alpha/beta comparisons int-to-int instead of mixing in float('inf').
+# Bounds can end up stored as scores, so this must fit the TT's 30-bit score field.
+INF = 10_000_000
+
+# Null-move pruning: depth reduction for the null-move search, and the minimum
+# remaining depth to try it at (the deepest negamax node at 'hard' has depth 2).
+# Trying it from depth 2, where the null-move search is just quiescence, still
+# saves more nodes than it costs, even in deeper searches.
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 2
+
+def has_non_pawn_material(board, color):
+    """True if 'color' has a piece besides pawns and the king (guards null-move pruning against zugzwang)."""
+    return bool(board.occupied_co[color] & ~board.pawns & ~board.kings)
+
+class SearchAborted(Exception):
+    """Raised inside negamax to unwind a search once search_stop is set or time runs out."""
+
+# Set to make the searches running in this process unwind (see lazy_smp_search)
+search_stop = threading.Event()
+
+# Soft time limit for one search, in seconds. Once it runs out, iterative deepening
+# abandons the depth in progress and plays the best move of the last completed one.
+SEARCH_TIME_LIMIT = float(os.environ.get('SEARCH_TIME_LIMIT', 10))
+search_deadline = float('inf') # time.monotonic() value at which the current search stops
+
+# Negamax with Alpha-Beta Pruning. Scores are always from the perspective of the
+# side to move, so a child's score is negated and every node maximizes.
+def negamax(board, depth, alpha, beta):
+    if search_stop.is_set() or time.monotonic() > search_deadline:
+        raise SearchAborted()
+
+    # Check transposition table (keyed by the board's incremental Zobrist hash).
+    # Bounds from a deep enough search narrow the window; an exact score, or
+    # bounds that close it, answer the node outright.
+    alpha_orig, beta_orig = alpha, beta
+    key = board.zkey
+    entry = tt_probe(key)
+    tt_move = None
+    if entry is not None:
+        tt_move = entry.best_move
+        if entry.depth >= depth:
+            if entry.flag == TT_EXACT:
+                return entry.score
+            if entry.flag == TT_LOWERBOUND:
+                if entry.score > alpha:
+                    alpha = entry.score
+            elif entry.score < beta: # TT_UPPERBOUND
+                beta = entry.score
+            if alpha >= beta:
+                return entry.score
     
     if depth == 0:
         # Enter quiescence search at depth 0
-        score = quiescence_search(board, ai_color_is_white, alpha, beta)
-        transposition_table[fen] = (depth, score, TT_EXACT)
+        score = quiescence_search(board, alpha, beta)
+        tt_store(key, depth, score, tt_bound(score, alpha_orig, beta_orig))
         return score
 
-    if board.is_checkmate():
-        # Score for checkmate should be very high, but depends on who delivers it.
-        # If the AI delivers checkmate, it's a huge positive score.
-        # If the opponent delivers checkmate, it's a huge negative score.
-        if board.turn == (chess.WHITE if ai_color_is_white else chess.BLACK):
-             # Current player (opponent) is checkmated, so it's AI's win
-            score = 1000000 # AI wins
-        else:
-            # AI is checkmated, so it's AI's loss
-            score = -1000000 # AI loses
-        transposition_table[fen] = (depth, score, TT_EXACT)
-        return score
-    elif board.is_stalemate() or board.is_insufficient_material() or board.is_fivefold_repetition() or board.is_seventyfive_moves():
+    # Checkmate and stalemate are found by the move loop below running out of legal moves
+    if board.is_insufficient_material() or board.is_fivefold_repetition() or board.is_seventyfive_moves():
         score = 0
-        transposition_table[fen] = (depth, score, TT_EXACT)
+        tt_store(key, depth, score, TT_EXACT)
         return score
 
-    best_score_for_node = float('-inf') if ai_color_is_white else float('inf')
-    flag = TT_LOWERBOUND if ai_color_is_white else TT_UPPERBOUND
-
-    # Get legal moves and sort them for better alpha-beta pruning
-    legal_moves = list(board.legal_moves)
-    # Sort moves by MVL/LVA and checks first
-    legal_moves.sort(key=lambda move: calculate_mvl_lva(board, move) + (100 if board.gives_check(move) else 0), reverse=True) # Higher is better
-
-    for move in legal_moves:
-        board.push(move)
-        # Call minimax for the opponent's turn (negamax approach)
-        score = minimax(board, depth - 1, not ai_color_is_white, -beta, -alpha) # Negamax with alpha-beta
-        board.pop() # Undo the move
-
-        if ai_color_is_white: # Maximizing player
-            if score > best_score_for_node:
-                best_score_for_node = score
-            alpha = max(alpha, score)
-        else: # Minimizing player
-            if score < best_score_for_node:
-                best_score_for_node = score
-            beta = min(beta, score)
-
-        if beta <= alpha:
-            # Cutoff occurred, so the value is a bound, not an exact score.
-            # If current player is maximizing, it's a lower bound (we found a move
-            # that's at least 'best_score_for_node').
-            # If current player is minimizing, it's an upper bound (we found a move
-            # that's at most 'best_score_for_node').
-            flag = TT_LOWERBOUND if ai_color_is_white else TT_UPPERBOUND
+    # Null-move pruning: pass the turn and search shallower. If the opponent still
+    # can't get back up to beta, a real move would fail high the same way.
+    if depth >= NULL_MOVE_MIN_DEPTH and board.move_stack and board.peek() and \
+       not board.is_check() and has_non_pawn_material(board, board.turn):
+        board.push(chess.Move.null())
+        score = -negamax(board, max(depth - 1 - NULL_MOVE_REDUCTION, 0), -beta, -beta + 1)
+        board.pop()
+        if score >= beta:
+            # A mate found after passing isn't proven (passing isn't a legal move),
+            # so only claim beta for it
+            return beta if score >= MATE_SCORE else score
+
+    best_score_for_node = -INF
+    best_move_for_node = None
+
+    # Bind the per-move calls to locals for the loop
+    push = board.push
+    pop = board.pop
+    was_into_check = board.was_into_check
+
+    # Pseudo-legal moves, generated stage by stage for better alpha-beta pruning.
+    # Legality is only tested for the moves actually searched, once each is pushed.
+    for move in staged_moves(board, tt_move):
+        push(move)
+        if was_into_check():
+            # Leaves our own king in check, so it isn't a legal move
+            pop()
+            continue
+        # The opponent's best score is our worst, so negate it and swap the window
+        score = -negamax(board, depth - 1, -beta, -alpha)
+        pop() # Undo the move
+
+        if score > best_score_for_node:
+            best_score_for_node = score
+            best_move_for_node = move
+        if score > alpha:
+            alpha = score
+        if alpha >= beta:
+            if not move.promotion and not board.is_capture(move):
+                record_quiet_cutoff(board, move, depth)
             break # Alpha-beta cutoff
 
-    transposition_table[fen] = (depth, best_score_for_node, flag) # Store score with correct flag
+    if best_move_for_node is None:
+        # No legal moves: the side to move is checkmated if in check, otherwise stalemated
+        score = -MATE_SCORE if board.is_check() else 0
+        tt_store(key, depth, score, TT_EXACT)
+        return score
+
+    # Store the score with the bound it has relative to the window the node was searched with
+    tt_store(key, depth, best_score_for_node, tt_bound(best_score_for_node, alpha_orig, beta_orig), best_move_for_node)
     return best_score_for_node
 
-def calculate_mvl_lva(board, move):
-    """Calculates Most Valuable Victim - Least Valuable Attacker for move ordering."""
-    if not board.is_capture(move):
-        return 0 # No capture, no MVL/LVA value
+def search_root(board, depth, root_moves):
+    """
+    Searches the legal moves 'root_moves', in the order given, to the given depth
+    and returns (best_move, best_score).
+    """
+    best_score = -INF
+    best_move = None
 
-    victim_piece = board.piece_at(move.to_square)
-    attacker_piece = board.piece_at(move.from_square)
+    push = board.push
+    pop = board.pop
+    for move in root_moves:
+        push(move)
+        # Only moves that beat the best so far matter, so it serves as alpha
+        score = -negamax(board, depth - 1, -INF, -best_score)
+        pop() # Undo the move
 
-    if not victim_piece or not attacker_piece:
-        return 0 # Should not happen for a capture
+        if score > best_score:
+            best_score = score
+            best_move = move
 
-    victim_value = PIECE_VALUES.get(victim_piece.piece_type, 0)
-    attacker_value = PIECE_VALUES.get(attacker_piece.piece_type, 0)
+    return best_move, best_score
 
-    # Prioritize capturing higher value pieces with lower value pieces
-    return victim_value - attacker_value
+def iterative_deepening(board, max_depth):
+    """
+    Searches depth 1, 2, ... max_depth, reusing the transposition table between
+    iterations so each one starts from the previous best moves. Returns the best move
+    of the deepest iteration that finished before the search was stopped.
+    """
+    # The root moves are generated once, sorted by MVV/LVA for better alpha-beta
+    # pruning; every iteration searches the same list
+    root_moves = order_moves(board, list(board.legal_moves))
+    best_move = None
+    ply = len(board.move_stack)
+    for depth in range(1, max_depth + 1):
+        try:
+            best_move, best_score = search_root(board, depth, root_moves)
+        except SearchAborted:
+            # Undo the moves the unfinished iteration left on the board
+            while len(board.move_stack) > ply:
+                board.pop()
+            break
+        # The next iteration searches this one's best move first
+        root_moves.remove(best_move)
+        root_moves.insert(0, best_move)
+    if best_move is None and root_moves:
+        # Stopped before even depth 1 finished; any legal move beats none
+        best_move = root_moves[0]
+    return best_move
+
+# Lazy SMP: helper threads search the same position one ply deeper or at the same
+# depth, and share what they find with the main search only through the
+# transposition table. Threads only run in parallel on a free-threaded (no-GIL)
+# CPython build, so by default there are no helpers otherwise.
+_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+LAZY_SMP_THREADS = int(os.environ.get('LAZY_SMP_THREADS', 1 if _gil_enabled else os.cpu_count() or 1))
+_smp_pool = None # Created on first use, in the process that runs the search
+
+def _smp_helper(board, depth):
+    iterative_deepening(board, depth)
+
+def lazy_smp_search(board, depth):
+    """Iterative deepening on 'board', helped by LAZY_SMP_THREADS - 1 threads. Returns the best move."""
+    global _smp_pool
+    if LAZY_SMP_THREADS <= 1:
+        return iterative_deepening(board, depth)
+    if _smp_pool is None:
+        _smp_pool = concurrent.futures.ThreadPoolExecutor(max_workers=LAZY_SMP_THREADS - 1)
+
+    search_stop.clear()
+    helpers = [_smp_pool.submit(_smp_helper, board.copy(), depth + i % 2)
+               for i in range(1, LAZY_SMP_THREADS)]
+    try:
+        return iterative_deepening(board, depth)
+    finally:
+        # The main search decides the move; stop the helpers before the next search starts
+        search_stop.set()
+        concurrent.futures.wait(helpers)
+        search_stop.clear()
+
+# Piece values indexed by piece type, for delta pruning. Index 0 is an en passant
+# capture, where the captured pawn isn't on the target square.
+VICTIM_VALUES = (PIECE_VALUES[chess.PAWN],) + tuple(PIECE_VALUES[piece_type] for piece_type in chess.PIECE_TYPES)
+
+# Most Valuable Victim - Least Valuable Attacker ordering keys, MVV_LVA[victim][attacker]
+# by piece type. Victim 0 is an empty target square (a quiet move) and scores 0;
+# every capture scores above that, the victim first and the attacker breaking ties.
+MVV_LVA = tuple(
+    tuple(victim * 100 - attacker if victim else 0 for attacker in range(7))
+    for victim in range(7)
+)
+# Promotions go before captures, the queen first: the promotion piece type times this
+PROMOTION_ORDER_BONUS = 1000
+
+def order_moves(board, moves):
+    """
+    Returns the moves sorted by promotion, then MVV-LVA, with quiet moves last.
+    Each key is two table lookups, computed once up front. En passant captures
+    (the only captures onto an empty square) sort with the quiet moves.
+    """
+    piece_type_at = board.piece_type_at
+    keys = [MVV_LVA[piece_type_at(move.to_square) or 0][piece_type_at(move.from_square)]
+            + (move.promotion or 0) * PROMOTION_ORDER_BONUS
+            for move in moves]
+    order = sorted(range(len(moves)), key=keys.__getitem__, reverse=True) # Higher is better
+    return [moves[i] for i in order]
+
+# Killer moves: the last two quiet moves that caused a beta cutoff at each ply,
+# indexed by len(board.move_stack). Search depths stay far below MAX_PLY; the
+# modulo only guards boards set up with a long move history.
+MAX_PLY = 64
+killer_moves = [[None, None] for _ in range(MAX_PLY)]
+# History heuristic: depth * depth summed over the beta cutoffs each quiet move
+# caused, indexed by from_square * 64 + to_square. Halved whenever an entry
+# passes HISTORY_LIMIT, so older cutoffs fade.
+HISTORY_LIMIT = 1 << 16
+history_scores = [0] * (64 * 64)
+
+def clear_move_history():
+    """Forgets the killer moves and history scores of earlier searches."""
+    for killers in killer_moves:
+        killers[0] = killers[1] = None
+    history_scores[:] = [0] * (64 * 64)
+
+def record_quiet_cutoff(board, move, depth):
+    """Remembers a quiet move that caused a beta cutoff, as a killer and in the history table."""
+    killers = killer_moves[len(board.move_stack) % MAX_PLY]
+    if killers[0] != move:
+        killers[1] = killers[0]
+        killers[0] = move
+    index = move.from_square * 64 + move.to_square
+    history_scores[index] += depth * depth
+    if history_scores[index] > HISTORY_LIMIT:
+        history_scores[:] = [score >> 1 for score in history_scores]
+
+def order_quiet_moves(moves):
+    """Returns the quiet moves sorted by promotion (queen first), then history score."""
+    history = history_scores
+    keys = [(move.promotion or 0) << 20 | history[move.from_square * 64 + move.to_square] for move in moves]
+    order = sorted(range(len(moves)), key=keys.__getitem__, reverse=True) # Higher is better
+    return [moves[i] for i in order]
+
+def staged_moves(board, tt_move=None):
+    """
+    Yields the pseudo-legal moves of the position in search order: the TT move,
+    then captures by MVV-LVA, then the killer moves, then the other quiet moves
+    by history. A stage is only generated once the previous one is used up, so
+    a cutoff skips generating the rest.
+    """
+    # Best move from an earlier (shallower) search of this position; it may come
+    # from a different position with a colliding key, so check it fits this one
+    if tt_move is not None and board.is_pseudo_legal(tt_move):
+        yield tt_move
+    else:
+        tt_move = None
+
+    # Each stage is generated into a list before its first move is played on the board
+    for move in order_moves(board, list(board.generate_pseudo_legal_captures())):
+        if move != tt_move:
+            yield move
+
+    # Killers come from sibling positions, so check each is a quiet move here
+    searched = [tt_move]
+    for killer in tuple(killer_moves[len(board.move_stack) % MAX_PLY]):
+        if killer is not None and killer not in searched and board.is_pseudo_legal(killer) and \
+           not board.is_capture(killer):
+            searched.append(killer)
+            yield killer
+
+    # Everything not landing on an opposing piece (castling targets our own rook's square).
+    # En passant captures were already generated with the captures.
+    quiet_moves = board.generate_pseudo_legal_moves(chess.BB_ALL, ~board.occupied_co[not board.turn])
+    if board.ep_square is None:
+        quiet_moves = list(quiet_moves)
+    else:
+        quiet_moves = [move for move in quiet_moves if not board.is_en_passant(move)]
+    for move in order_quiet_moves(quiet_moves):
+        if move not in searched:
+            yield move
+
+def static_exchange_eval(board, move):
+    """
+    Material won by the capture 'move' once both sides have traded on the target
+    square, each recapturing with its least valuable piece and free to stop when
+    continuing would lose material. Pins are ignored.
+    """
+    to_square = move.to_square
+    occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+    victim_type = board.piece_type_at(to_square)
+    if victim_type is None: # En passant: the captured pawn is behind the target square
+        victim_type = chess.PAWN
+        occupied &= ~chess.BB_SQUARES[to_square + (-8 if board.turn == chess.WHITE else 8)]
+
+    # Value taken by each capture in the sequence, starting with 'move' itself
+    captured_values = [PIECE_VALUES[victim_type]]
+    value_on_square = PIECE_VALUES[board.piece_type_at(move.from_square)]
+    side = not board.turn
+    while True:
+        attackers = board.attackers_mask(side, to_square, occupied) & occupied
+        if not attackers:
+            break
+        for piece_type in chess.PIECE_TYPES: # Least valuable attacker first
+            piece_attackers = attackers & board.pieces_mask(piece_type, side)
+            if piece_attackers:
+                break
+        captured_values.append(value_on_square)
+        value_on_square = PIECE_VALUES[piece_type]
+        occupied &= ~chess.BB_SQUARES[chess.lsb(piece_attackers)] # Uncovers sliders behind it
+        side = not side
+
+    # Walk back from the last capture; every recapture after 'move' is optional
+    gain = 0
+    for value in reversed(captured_values[1:]):
+        gain = max(0, value - gain)
+    return captured_values[0] - gain
+
+
+# --- Search Workers ---
+# One reusable ZobristBoard per thread of a search worker process. Request handlers
+# don't use it: each async request runs on a fresh event loop thread, so there is
+# nothing to reuse there.
+_board_cache = threading.local()
+
+def get_cached_board(board_fen):
+    """Returns this thread's ZobristBoard, set up from board_fen."""
+    board = getattr(_board_cache, 'board', None)
+    if board is None:
+        board = _board_cache.board = ZobristBoard()
+    board.set_fen(board_fen)
+    return board
+
+# The search is CPU-bound pure Python, so it runs in worker processes: awaiting it
+# keeps the event loop free, and concurrent requests use separate cores instead of
+# queueing behind one GIL. Each worker process keeps its own transposition table.
+# The pool is created on first use, in the process that serves requests: a server
+# that preloads the app (gunicorn --preload) forks its workers before any pool
+# exists, so they don't end up sharing one pool's queues.
+# Every worker holds its own transposition table, so the pool is sized from the CPUs
+# this process may actually run on rather than the host's count; SEARCH_WORKERS overrides it.
+# Workers come from a fork server (or are spawned where there is none) instead of being
+# forked from whichever request thread happens to create the pool.
+_available_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+SEARCH_WORKERS = max(1, int(os.environ.get('SEARCH_WORKERS', _available_cpus)))
+SEARCH_POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+_search_pool = None
+_search_pool_lock = threading.Lock() # Requests run on separate threads
+
+def get_search_pool():
+    """Returns this process's search worker pool, creating it on first use."""
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=SEARCH_WORKERS, mp_context=multiprocessing.get_context(SEARCH_POOL_START_METHOD))
+        return _search_pool
+
+def discard_search_pool(pool):
+    """Drops 'pool' if it is still the current search pool, so the next search starts a new one."""
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is pool:
+            _search_pool = None
+    pool.shutdown(wait=False)
+
+async def run_in_search_pool(func, *args):
+    """
+    Runs func(*args) in the search pool and returns its result without blocking the
+    event loop. A worker that dies (e.g. killed for running out of memory) breaks the
+    whole pool; it is then replaced and the call retried once.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_search_pool()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except concurrent.futures.process.BrokenProcessPool:
+        app.logger.warning("Search pool broken; starting a new one")
+        discard_search_pool(pool)
+        return await loop.run_in_executor(get_search_pool(), func, *args)
+
+def search_entry(board_fen, depth):
+    """Runs in a search pool worker. Searches the position and returns the best move in UCI, or None."""
+    global search_deadline
+    board = get_cached_board(board_fen)
+
+    # The transposition table is kept between requests; entries from earlier
+    # searches are aged out by generation instead of being cleared
+    tt_new_search()
+    clear_move_history()
+    search_deadline = time.monotonic() + SEARCH_TIME_LIMIT
+
+    # Perform the AI search using our custom negamax, deepening one ply at a time.
+    # The handler has already checked that it is the AI's turn.
+    best_move = lazy_smp_search(board, depth)
+    return best_move.uci() if best_move else None
+
+# Root splitting: search the expected best root move first, then all the others at
+# once across the search pool. It only pays for the extra round trips on a deep enough
+# search with more than one worker process; 0 turns it off.
+ROOT_SPLIT_MIN_DEPTH = int(os.environ.get('ROOT_SPLIT_MIN_DEPTH', 3 if SEARCH_WORKERS > 1 else 0))
+_split_search_ids = itertools.count(1) # Numbers the split searches started by this process
+_current_split_search = None # In a worker: id of the split search it last searched a root move for
+
+def search_root_move(board_fen, move_uci, depth, alpha, beta, deadline, search_id):
+    """
+    Runs in a search pool worker. Plays one root move and returns its score for the
+    side to move at the root, searched to 'depth' plies with the root window
+    (alpha, beta). Returns None if the deadline passes first.
+    """
+    global search_deadline, _current_split_search
+    if search_id != _current_split_search:
+        # First move of a new split search in this worker: age out the earlier
+        # searches' TT entries, as search_entry does for a whole search
+        _current_split_search = search_id
+        tt_new_search()
+        clear_move_history()
+    board = get_cached_board(board_fen)
+    board.push(chess.Move.from_uci(move_uci))
+    search_deadline = deadline
+    try:
+        # Shallower searches first, so the last one is ordered from the TT
+        for child_depth in range(depth):
+            score = -negamax(board, child_depth, -beta, -alpha)
+    except SearchAborted:
+        return None
+    return score
 
+async def split_root_search(board, board_fen, depth):
+    """
+    Searches the position on 'board' across the search pool and returns the best move in UCI.
+    The best move of a search one ply shallower gets a full-window search; every other
+    move is then searched in parallel with a null window just above its score, and
+    only moves that fail high are searched again to get their real score.
+    """
+    deadline = time.monotonic() + SEARCH_TIME_LIMIT
+    search_id = next(_split_search_ids)
+    root_moves = [move.uci() for move in order_moves(board, list(board.legal_moves))]
+
+    best_move = await run_in_search_pool(search_entry, board_fen, depth - 1)
+    best_score = await run_in_search_pool(search_root_move,
+                                          board_fen, best_move, depth, -INF, INF, deadline, search_id)
+    if best_score is None:
+        return best_move # Out of time; the shallower search's move will do
+
+    # At most one move per worker is queued at a time, so a split search doesn't put
+    # its whole move list in the pool's queue ahead of other requests' searches
+    in_flight = asyncio.Semaphore(SEARCH_WORKERS)
+
+    async def search_null_window(move):
+        async with in_flight:
+            return await run_in_search_pool(search_root_move, board_fen, move, depth,
+                                            best_score, best_score + 1, deadline, search_id)
+
+    other_moves = [move for move in root_moves if move != best_move]
+    scores = await asyncio.gather(*(search_null_window(move) for move in other_moves))
+    for move, score in zip(other_moves, scores):
+        if score is not None and score > best_score:
+            # Failed high: at least as good as the best so far, so get its real score
+            score = await run_in_search_pool(search_root_move,
+                                             board_fen, move, depth, best_score, INF, deadline, search_id)
+            if score is not None and score > best_score:
+                best_score = score
+                best_move = move
+    return best_move
 
 # --- API Endpoint ---
 @app.route('/api/get_ai_move', methods=['POST'])
 async def get_ai_move(): # Make the route function 'async'
     """
-    API endpoint to get the best move from the AI (custom minimax).
+    API endpoint to get the best move from the AI (custom negamax).
     Request body:
     {
         "board_fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
@@ -697,9 +1166,9 @@ async def get_ai_move(): # Make the route function 'async'
         return jsonify({"success": False, "message": "Missing board_fen, ai_color, or difficulty"}), 400
 
     try:
-        # Initialize the chess board from FEN
+        # Initialize the chess board from FEN, to validate the request; the search
+        # workers set up their own ZobristBoard from the FEN
         board = chess.Board(board_fen)
-        ai_is_white = (ai_color_str.lower() == 'white')
         
         # Check if the game is already over
         if board.is_game_over():
@@ -718,46 +1187,22 @@ async def get_ai_move(): # Make the route function 'async'
         elif difficulty == 'intermediate':
             depth = 2
         elif difficulty == 'hard':
-            depth = 3 # Adjusted to prevent hitting recursion limit frequently
+            depth = 3
         else:
             depth = 2 # Default for unknown difficulty
 
-        # Clear transposition table for a fresh search (optional, depends on caching strategy)
-        transposition_table.clear()
+        # Run the search in the process pool and wait for it without blocking the event loop
+        if ROOT_SPLIT_MIN_DEPTH and depth >= ROOT_SPLIT_MIN_DEPTH:
+            best_move_uci = await split_root_search(board, board_fen, depth)
+        else:
+            best_move_uci = await run_in_search_pool(search_entry, board_fen, depth)
 
-        # Perform the AI search using our custom minimax
-        best_score = float('-inf') if ai_is_white else float('inf')
-        best_move = None
-        
-        legal_moves_for_ai = list(board.legal_moves)
-        
-        if not legal_moves_for_ai:
-            return jsonify({"success": False, "message": "No legal moves for AI (checkmate/stalemate)"}), 200
-
-        # Sort moves for better alpha-beta pruning (MVL/LVA + checks)
-        legal_moves_for_ai.sort(key=lambda move: calculate_mvl_lva(board, move) + (100 if board.gives_check(move) else 0), reverse=True)
-
-        for move in legal_moves_for_ai:
-            board.push(move)
-            # Call minimax for the opponent's turn (negamax approach)
-            score = minimax(board, depth - 1, not ai_is_white, -math.inf, math.inf)
-            board.pop() # Undo the move
-
-            if ai_is_white: # Maximizing player
-                if score > best_score:
-                    best_score = score
-                    best_move = move
-            else: # Minimizing player
-                if score < best_score:
-                    best_score = score
-                    best_move = move
-
-        if best_move:
+        if best_move_uci:
             response_move = {
                 # UCI format: "e2e4", "g1f3", "e7e8q" (from_square, to_square, promotion if any)
-                "from_square": best_move.uci()[0:2],
-                "to_square": best_move.uci()[2:4],
-                "promotion": best_move.promotion.name.lower() if best_move.promotion else None
+                "from_square": best_move_uci[0:2],
+                "to_square": best_move_uci[2:4],
+                "promotion": best_move_uci[4:] or None
             }
             return jsonify({"success": True, "move": response_move, "message": "AI found a move."}), 200
         else:
@@ -769,8 +1214,11 @@ async def get_ai_move(): # Make the route function 'async'
         return jsonify({"success": False, "message": str(e)}), 500
 
 # Run the Flask app
+# In production, serve it with a WSGI server that loads the app once and forks
+# its workers from that, e.g. "gunicorn --preload --workers 2 --bind 0.0.0.0:5000 app:app".
+# The tables above are then built once and shared copy-on-write.
 if __name__ == '__main__':
-    import asyncio
     # Using '0.0.0.0' makes the server accessible from other devices on your network.
     # For local development, '127.0.0.1' or 'localhost' also works.
-    asyncio.run(app.run(debug=True, host='0.0.0.0', port=5000))
+    # The debugger and reloader stay off: they slow down every request.
+    app.run(debug=False, host='0.0.0.0', port=5000)
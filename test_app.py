@@ -0,0 +1,102 @@
+"""
+Regression tests for the incremental Zobrist hash and the packed transposition table.
+Run with: python -m unittest test_app
+"""
+import random
+import unittest
+
+import chess
+import chess.polyglot
+
+import app
+
+# Positions that exercise castling rights, en passant and promotions
+SPECIAL_FENS = [
+    "r3k2r/pppq1ppp/2n1bn2/3pp3/3PP3/2N1BN2/PPPQ1PPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    "rnbqkbnr/pppp1ppp/8/8/3Pp3/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 2",
+    "1n2k3/P5P1/8/8/8/8/1p5p/4K1N1 w - - 0 1",
+]
+
+class ZobristBoardTest(unittest.TestCase):
+    def assert_key_matches(self, board):
+        self.assertEqual(board.zkey, chess.polyglot.zobrist_hash(board), board.fen())
+
+    def test_matches_polyglot_over_random_games(self):
+        rng = random.Random(1)
+        for game in range(120):
+            board = app.ZobristBoard(SPECIAL_FENS[game % len(SPECIAL_FENS)] if game % 2 else chess.STARTING_FEN)
+            self.assert_key_matches(board)
+            for ply in range(100):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                if rng.random() < 0.05 and not board.is_check():
+                    move = chess.Move.null()
+                else:
+                    move = rng.choice(moves)
+                board.push(move)
+                self.assert_key_matches(board)
+                if rng.random() < 0.1:
+                    copy = board.copy()
+                    self.assertEqual(copy.zkey, board.zkey)
+                    copy.pop()
+                    board.pop()
+                    self.assertEqual(copy.zkey, board.zkey)
+                    self.assert_key_matches(board)
+
+    def test_every_move_from_special_positions(self):
+        for fen in SPECIAL_FENS:
+            board = app.ZobristBoard(fen)
+            for move in list(board.legal_moves):
+                board.push(move)
+                self.assert_key_matches(board)
+                board.pop()
+                self.assert_key_matches(board)
+
+    def test_set_fen_rehashes(self):
+        board = app.ZobristBoard()
+        board.push_uci("e2e4")
+        board.set_fen(SPECIAL_FENS[1])
+        self.assert_key_matches(board)
+
+class TranspositionTableTest(unittest.TestCase):
+    def setUp(self):
+        app.tt_new_search()
+
+    def test_round_trip(self):
+        rng = random.Random(2)
+        moves = [None, chess.Move.from_uci("e2e4"), chess.Move.from_uci("a7a8q"),
+                 chess.Move.from_uci("h2h1n"), chess.Move.from_uci("e1g1")]
+        scores = [0, 1, -1, 12345, -12345, app.MATE_SCORE, -app.MATE_SCORE, app.INF - 1, -app.INF + 1]
+        for score in scores:
+            for flag in (app.TT_EXACT, app.TT_LOWERBOUND, app.TT_UPPERBOUND):
+                key = rng.getrandbits(64)
+                depth = rng.randrange(256)
+                move = rng.choice(moves)
+                app.tt_store(key, depth, score, flag, move)
+                self.assertEqual(app.tt_probe(key), app.TTEntry(depth, score, flag, move))
+
+    def test_miss(self):
+        key = random.Random(3).getrandbits(64)
+        app.tt_store(key, 3, 50, app.TT_EXACT)
+        self.assertIsNone(app.tt_probe(key ^ 1 << 63)) # Same bucket, different position
+
+    def test_same_position_keeps_best_move_and_depth(self):
+        key = random.Random(5).getrandbits(64)
+        move = chess.Move.from_uci("g1f3")
+        app.tt_store(key, 4, 30, app.TT_LOWERBOUND, move)
+        app.tt_store(key, 0, 10, app.TT_UPPERBOUND) # Quiescence result: the deeper entry stays
+        self.assertEqual(app.tt_probe(key), app.TTEntry(4, 30, app.TT_LOWERBOUND, move))
+        app.tt_store(key, 2, 20, app.TT_UPPERBOUND) # No best move: the stored one is kept
+        self.assertEqual(app.tt_probe(key), app.TTEntry(2, 20, app.TT_UPPERBOUND, move))
+
+    def test_torn_entry_reads_as_miss(self):
+        key = random.Random(4).getrandbits(64)
+        app.tt_store(key, 3, 50, app.TT_EXACT)
+        slot = (key & app.TT_BUCKET_MASK) << 1
+        app.tt_entries[slot] += 1 << 34 # As if another thread stored its entry but not yet its key
+        self.assertIsNone(app.tt_probe(key))
+
+if __name__ == '__main__':
+    unittest.main()